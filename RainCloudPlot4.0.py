@@ -1,26 +1,108 @@
+import io
+import hashlib
+from pathlib import Path
 import streamlit as st
 import polars as pl
+import polars.selectors as cs
 import plotly.graph_objects as go
 import numpy as np
-# Requires: pip install pingouin
-import pingouin as pg
+from scipy.stats import gaussian_kde, mannwhitneyu, ttest_ind
+
+DESCRIBE_COLUMNS = ["Count", "Mean", "Std Dev", "Min", "25th Percentile", "Median", "75th Percentile", "Max"]
+
+# Below this many values the Polars aggregation is as fast as the Numba kernel,
+# which also has to be loaded (or JIT-compiled) once per server process
+NUMBA_MIN_VALUES = 20_000_000
+
+# Parse raw upload bytes once per unique file; reruns hit the cache. Only the
+# first MAX_COLUMNS columns are kept: for CSV the header is peeked first and the
+# projection is pushed into the reader so wide files skip unused columns
+@st.cache_data(show_spinner=False, max_entries=8, ttl="1h")
+def _parse_bytes(data, name):
+    buffer = io.BytesIO(data)
+    if name.endswith(".csv"):
+        header = pl.read_csv(buffer, n_rows=0).columns
+        buffer.seek(0)
+        return pl.read_csv(buffer, columns=header[:MAX_COLUMNS])
+    # Requires: pip install fastexcel (calamine engine, much faster than openpyxl/xlsx2csv)
+    # calamine loads the whole sheet whatever is projected, so read it once and slice
+    df = pl.read_excel(buffer, engine="calamine")
+    return df.select(df.columns[:MAX_COLUMNS])
 
 # Helper function to load and process data
 def load_data(file):
     if file:
         try:
             name = file.name.lower()
-            if name.endswith(".csv"):
-                return pl.read_csv(file)
-            elif name.endswith((".xlsx", ".xls")):
-                # Requires: pip install fastexcel
-                return pl.read_excel(file)
+            if name.endswith((".csv", ".xlsx", ".xls")):
+                return _parse_bytes(file.getvalue(), name)
             else:
                 st.error("Unsupported file type. Please upload a CSV or Excel file.")
         except Exception as e:
             st.error(f"Error reading file: {e}")
     return None
 
+# Melt the selected columns into long format and derive the group list and the
+# per-group float64 NumPy arrays from the same lazy plan, cached on the file fingerprint
+@st.cache_data(show_spinner=False, max_entries=8, ttl="1h")
+def prepare_long_data(data_key, columns, _df):
+    melted = _df.lazy().select(columns).unpivot(variable_name="Group", value_name="Value")
+    unique_groups = melted.select(pl.col("Group").unique(maintain_order=True))
+    grouped = melted.group_by("Group", maintain_order=True).agg(pl.col("Value").drop_nulls().cast(pl.Float64))
+    df_melted, unique_groups, grouped = pl.collect_all([melted, unique_groups, grouped])
+    group_arrays = dict(zip(grouped["Group"].to_list(), [values.to_numpy() for values in grouped["Value"]]))
+    return df_melted, tuple(unique_groups["Group"].to_list()), group_arrays
+
+# Descriptive statistics per group: Polars aggregation, or the fused Numba kernel
+# for very large uploads when numba is installed
+@st.cache_data(show_spinner=False, max_entries=8, ttl="1h")
+def compute_descriptive_stats(data_key, columns, _df_melted, _group_arrays):
+    group_describe = None
+    if sum(len(values) for values in _group_arrays.values()) >= NUMBA_MIN_VALUES:
+        try:
+            # Optional: pip install numba
+            from describe_kernel import group_describe
+        except ImportError:
+            pass
+    if group_describe is None:
+        return _df_melted.lazy().group_by("Group", maintain_order=True).agg([
+            pl.col("Value").count().alias("Count"),
+            pl.col("Value").mean().alias("Mean"),
+            pl.col("Value").std().alias("Std Dev"),
+            pl.col("Value").min().alias("Min"),
+            pl.col("Value").quantile(0.25, interpolation="linear").alias("25th Percentile"),
+            pl.col("Value").median().alias("Median"),
+            pl.col("Value").quantile(0.75, interpolation="linear").alias("75th Percentile"),
+            pl.col("Value").max().alias("Max")
+        ]).collect()
+
+    groups = list(_group_arrays)
+    sizes = [len(_group_arrays[group]) for group in groups]
+    values = np.concatenate([_group_arrays[group] for group in groups])
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    out = np.empty((len(groups), len(DESCRIBE_COLUMNS)))
+    group_describe(values, offsets, out)
+    descriptive_stats = pl.DataFrame({"Group": groups, **{name: out[:, k] for k, name in enumerate(DESCRIBE_COLUMNS)}})
+    return descriptive_stats.with_columns(pl.col("Count").cast(pl.UInt32))
+
+# Evaluate a Gaussian KDE per group once; the violin outlines are drawn from these curves.
+# Group arrays are float64 by construction (numeric columns only, cast in prepare_long_data)
+@st.cache_data(show_spinner=False, max_entries=8, ttl="1h")
+def compute_violin_kde(data_key, columns, _group_arrays, n_points=200):
+    curves = {}
+    for group, y in _group_arrays.items():
+        curves[group] = None
+        # Fewer than two points: no density to draw
+        if len(y) < 2:
+            continue
+        ys = np.linspace(y.min(), y.max(), n_points)
+        try:
+            curves[group] = (ys, gaussian_kde(y)(ys))
+        except np.linalg.LinAlgError:
+            # Zero variance: the KDE covariance is singular
+            pass
+    return curves
+
 # Helper function to get numeric data for a group
 def get_numeric_data(df, group):
     try:
@@ -34,52 +116,289 @@ def get_numeric_data(df, group):
 def perform_statistical_test(data1, data2, test_type, g1, g2):
     try:
         if test_type == "Welch's T-Test":
-            ttest = pg.ttest(data1, data2, paired=False, alternative="two-sided")
+            t_stat, p_value = ttest_ind(data1, data2, equal_var=False)
+            n1, n2 = len(data1), len(data2)
+            pooled_std = np.sqrt(((n1 - 1) * data1.var(ddof=1) + (n2 - 1) * data2.var(ddof=1)) / (n1 + n2 - 2))
             return {
-                "T-stat": round(ttest['T'].values[0], 4),
-                "P-value": round(ttest['p-val'].values[0], 4),
-                "Cohen's d": round(ttest['cohen-d'].values[0], 4)
+                "T-stat": round(float(t_stat), 4),
+                "P-value": round(float(p_value), 4),
+                "Cohen's d": round(float(abs(data1.mean() - data2.mean()) / pooled_std), 4)
             }
         elif test_type == "Mann-Whitney U Test":
-            mannwhitney = pg.mwu(data1, data2, alternative="two-sided")
+            u_stat, p_value = mannwhitneyu(data1, data2, alternative="two-sided")
             return {
-                "U-stat": round(mannwhitney['U-val'].values[0], 4),
-                "P-value": round(mannwhitney['p-val'].values[0], 4)
+                "U-stat": round(float(u_stat), 4),
+                "P-value": round(float(p_value), 4)
             }
     except Exception as e:
         st.warning(f"Error performing {test_type} for {g1} vs {g2}: {e}")
         return None
 
-# Define the configure_plot_layout function at the top
-def configure_plot_layout(fig, fig_title, x_axis_label, y_axis_label, group_positions, group_labels, plot_width, plot_height, background_color, grid_color, y_min=None, y_max=None):
-    fig.update_layout(
+# Layout settings that never depend on the sidebar, built once at import
+AXIS_TITLE_FONT = dict(size=14, family="Arial, sans-serif", color="black")
+AXIS_TICK_FONT = dict(size=12, family="Arial, sans-serif", color="black")
+BASE_LAYOUT = dict(
+    title_font_size=20,
+    title_font_family="Arial",
+    title_x=0.5,  # Center the title horizontally
+    template="simple_white",  # Use a white background template
+    margin=dict(l=50, r=40, t=60, b=50),
+    plot_bgcolor="white",  # Set plot background to white
+    paper_bgcolor="white",  # Set paper background to white
+    showlegend=False
+)
+
+# Build the plot layout dict; passed straight to go.Figure so it is validated once
+def build_plot_layout(fig_title, x_axis_label, y_axis_label, group_positions, group_labels, plot_width, plot_height, background_color, grid_color, y_min=None, y_max=None):
+    return dict(
+        **BASE_LAYOUT,
         title_text=fig_title,
-        title_font_size=20,
-        title_font_family="Arial",
-        title_x=0.5,  # Center the title horizontally
         xaxis=dict(
-            title=dict(text=x_axis_label, font=dict(size=14, family="Arial, sans-serif", color="black")),
+            title=dict(text=x_axis_label, font=AXIS_TITLE_FONT),
             tickmode='array',
             tickvals=group_positions,
             ticktext=group_labels,
-            tickfont=dict(size=12, family="Arial, sans-serif", color="black"),
+            tickfont=AXIS_TICK_FONT,
         ),
         yaxis=dict(
-            title=dict(text=y_axis_label, font=dict(size=14, family="Arial, sans-serif", color="black")),
-            tickfont=dict(size=12, family="Arial, sans-serif", color="black"),
+            title=dict(text=y_axis_label, font=AXIS_TITLE_FONT),
+            tickfont=AXIS_TICK_FONT,
             gridcolor=grid_color,
             zerolinecolor=grid_color,
             range=[y_min, y_max] if y_min is not None and y_max is not None else None
         ),
-        template="simple_white",  # Use a white background template
-        margin=dict(l=50, r=40, t=60, b=50),
         width=plot_width,
-        height=plot_height,
-        plot_bgcolor="white",  # Set plot background to white
-        paper_bgcolor="white",  # Set paper background to white
-        showlegend=False
+        height=plot_height
     )
 
+# Build the raincloud traces; cached on the data fingerprint and the settings that
+# change trace geometry or colors. Pure style settings (opacity, outline widths and
+# colors, point size) are patched on by apply_trace_styles and layout-only settings by
+# build_plot_layout, so editing either reuses the cached traces. Dragging a geometry
+# slider adds one entry per value, so only the last few are kept
+@st.cache_data(show_spinner=False, max_entries=4, ttl="1h")
+def build_traces(data_key, columns, _group_arrays, groups, params):
+    palette = params["palette"]
+    # One color per group, cycled through the palette
+    group_colors = {group: palette[i % len(palette)] for i, group in enumerate(groups)}
+    # Distinct colors in use, and each group's index into them, so the dots can be split per color
+    trace_colors = list(dict.fromkeys(group_colors.values()))
+    group_color_codes = np.asarray([trace_colors.index(group_colors[group]) for group in groups])
+
+    traces = []
+
+    group_positions = params["group_positions"]
+    # float32 coordinate arrays go to the browser as compact typed arrays instead of JSON lists
+    position_array = np.asarray(group_positions, dtype=np.float32)
+
+    # Dots face the opposite direction of the violin
+    side = "positive" if params["violin_on"] and params["violin_direction"] == "Right" else "negative"
+    jitter_direction = 1 if side == "negative" else -1
+    group_sizes = [len(_group_arrays[group]) for group in groups]
+    # Flat float64 value array with an integer group code per value, shared by box and dots;
+    # values stay float64 so browser-side box quartiles match the statistics table
+    all_values = np.concatenate([_group_arrays[group] for group in groups])
+    group_idx = np.repeat(np.arange(len(groups)), group_sizes)
+
+    # Half violins are closed polygons built from the precomputed KDE. Polygons
+    # sharing a fill color go into one trace, separated by NaN breaks, so a
+    # palette of k colors needs at most k violin traces. Hover is skipped on
+    # them, since a merged trace has no single group name to show
+    if params["violin_on"]:
+        kde_curves = compute_violin_kde(data_key, columns, _group_arrays)
+        direction = -1 if side == "negative" else 1
+        polygons_by_color = {}
+        for i, group in enumerate(groups):
+            if kde_curves[group] is None:
+                continue
+            ys, density = kde_curves[group]
+            x_base = group_positions[i]
+            half_width = params["violin_width"] / 2 * density / density.max()
+            polygons_by_color.setdefault(group_colors[group], []).append((
+                np.concatenate([x_base + direction * half_width, [x_base, x_base, np.nan]]),
+                np.concatenate([ys, [ys[-1], ys[0], np.nan]])
+            ))
+
+        for color, polygons in polygons_by_color.items():
+            traces.append(go.Scatter(
+                x=np.concatenate([poly_x for poly_x, _ in polygons]).astype(np.float32),
+                y=np.concatenate([poly_y for _, poly_y in polygons]),
+                mode="lines",
+                fill="toself",
+                hoverinfo="skip",
+                fillcolor=color,
+                showlegend=False
+            ))
+
+    # A single box trace; Plotly splits it into one box per distinct x position
+    if params["box_on"]:
+        traces.append(go.Box(
+            y=all_values,
+            x=position_array[group_idx] + np.float32(params["violin_box_gap"]),
+            boxpoints=False,
+            width=params["box_width"],
+            showlegend=False
+        ))
+
+    # Dots go into one WebGL trace per distinct color, each with a single color string
+    if params["points_on"]:
+        # Generator seeded from the data fingerprint: the same upload always gets the
+        # same jitter and subsample, however many other draws happen in the rerun
+        rng = np.random.default_rng(int(data_key[:16], 16))
+        # Subsample large groups for the dots only; violin and box keep the full array
+        max_points = params["max_scatter_points"]
+        if max(group_sizes) > max_points:
+            offsets = np.concatenate([[0], np.cumsum(group_sizes)])
+            keep = np.concatenate([
+                offsets[i] + (rng.choice(n, max_points, replace=False) if n > max_points else np.arange(n))
+                for i, n in enumerate(group_sizes)
+            ])
+            points_y, points_idx = all_values[keep], group_idx[keep]
+        else:
+            points_y, points_idx = all_values, group_idx
+
+        # All dot x-coordinates in one vectorised expression across groups
+        jitter = params["point_jitter"] * rng.uniform(-0.5, 0.5, size=len(points_y))
+        points_x = (
+            position_array[points_idx]
+            + params["violin_box_gap"]
+            + params["box_points_gap"] * jitter_direction
+            + jitter
+        ).astype(np.float32)
+        points_color_codes = group_color_codes[points_idx]
+
+        for code, color in enumerate(trace_colors):
+            mask = points_color_codes == code
+            if not mask.any():
+                continue
+            traces.append(go.Scattergl(
+                y=points_y[mask],
+                x=points_x[mask],
+                mode="markers",
+                marker=dict(color=color),  # Using group_colors for marker color
+                hoverinfo="skip",
+                showlegend=False
+            ))
+    return traces
+
+# Patch style-only attributes onto the cached traces, restyle-style: the violin,
+# box and dot layers are told apart by trace type
+def apply_trace_styles(fig, style):
+    if style["violin_opacity"] is not None:
+        fig.update_traces(
+            selector=dict(type="scatter"),
+            opacity=style["violin_opacity"],
+            line=dict(width=style["violin_line_width"], color=style["violin_outline_color"])
+        )
+    if style["box_opacity"] is not None:
+        fig.update_traces(
+            selector=dict(type="box"),
+            opacity=style["box_opacity"],
+            line=dict(color="#000000", width=style["box_line_width"]),  # Outline color to black
+            fillcolor=style["box_color"]
+        )
+    if style["point_opacity"] is not None:
+        fig.update_traces(
+            selector=dict(type="scattergl"),
+            marker=dict(
+                size=style["point_size"],
+                opacity=style["point_opacity"],
+                line=dict(color=style["points_outline_color"], width=style["point_outline_width"])
+            )
+        )
+
+# Render PNG, SVG and PDF exports in one go; the result is kept in session state
+def render_export_images(fig, export_scale):
+    return (
+        fig.to_image(format="png", scale=export_scale),  # Use scale for resolution
+        fig.to_image(format="svg"),  # SVG format
+        fig.to_image(format="pdf")  # PDF format
+    )
+
+# Export section as a fragment: the scale/background widgets and the prepare
+# button rerun only this block, not the plot or the statistics
+@st.fragment
+def render_export_options(fig, df_melted, background_color, plot_signature):
+    st.markdown("<h2 style='color: #ffffff; margin-top: 2rem;'>Export Options</h2>", unsafe_allow_html=True)
+
+    try:
+        # Requires: pip install kaleido
+        import kaleido  # Ensure kaleido is installed for exporting images
+        col1, col2, col3, col4 = st.columns(4)  # Adjust columns to 4 for export options
+
+        # Allow users to customize PNG export scale and background
+        st.markdown("<h4 style='color: #8ab4f8;'>Customize PNG Export</h4>", unsafe_allow_html=True)
+        export_scale = st.slider("Export Scale", min_value=1, max_value=10, value=2, step=1)
+        st.markdown(
+            "<p style='font-size: 0.9rem; color: #e0e0e0;'>"
+            "The export scale multiplies the resolution of the exported image. For example, "
+            "a scale of 2 doubles the resolution, making the image sharper and suitable for high-quality outputs like presentations or printing."
+            "</p>",
+            unsafe_allow_html=True
+        )
+        transparent_background = st.checkbox("Transparent Background", value=True)
+
+        # Kaleido only runs when the user asks for images; the prepared files stay
+        # available until the plot inputs, the export background or the scale change.
+        # The signature is built from those inputs, so no rerun serialises the figure
+        export_signature = (plot_signature, transparent_background, background_color, export_scale)
+        prepared_images = st.session_state.get("prepared_images")
+        if prepared_images is None or prepared_images[0] != export_signature:
+            with col1:
+                if st.button("Prepare Image Downloads", key="prepare_images"):
+                    # Update layout explicitly before exporting
+                    fig.update_layout(
+                        plot_bgcolor="rgba(0,0,0,0)" if transparent_background else background_color,  # Transparent or custom background
+                        paper_bgcolor="rgba(0,0,0,0)" if transparent_background else background_color,  # Transparent or custom background
+                        font=dict(color="black")  # Ensure font color matches
+                    )
+                    prepared_images = (export_signature, render_export_images(fig, export_scale))
+                    st.session_state["prepared_images"] = prepared_images
+
+        if prepared_images is not None and prepared_images[0] == export_signature:
+            png_image, svg_image, pdf_image = prepared_images[1]
+            with col1:
+                st.download_button(
+                    "Download PNG",
+                    png_image,
+                    "raincloud_plot.png",
+                    "image/png"
+                )
+            with col2:
+                st.download_button(
+                    "Download SVG",
+                    svg_image,
+                    "raincloud_plot.svg",
+                    "image/svg+xml"
+                )
+            with col3:
+                st.download_button(
+                    "Download PDF",
+                    pdf_image,
+                    "raincloud_plot.pdf",
+                    "application/pdf"
+                )
+        try:
+            with col4:
+                csv_export = df_melted.write_csv()
+                st.download_button(
+                    "Download Data (CSV)",
+                    csv_export,
+                    "raincloud_data.csv",
+                    "text/csv"
+                )
+        except Exception as e:
+            st.warning(f"Error generating CSV: {e}")
+    except ImportError:
+        st.warning("Please install `kaleido` using `pip install -U kaleido` to enable image downloads.")
+    except Exception as e:
+        st.warning(f"Error generating image: {e}")
+
+# Read the dark mode stylesheet once per server process
+@st.cache_data(show_spinner=False)
+def load_css(path):
+    return Path(path).read_text()
+
 # Define color palettes for the plot
 COLOR_PALETTES = {
     "Aurora": ["#88CCEE", "#44AA99", "#117733", "#999933", "#DDCC77", "#CC6677", "#882255", "#AA4499"],
@@ -96,41 +415,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Apply custom CSS for a dark mode theme
-st.markdown("""
-<style>
-    /* General dark theme styling */
-    .stApp {
-        background-color: #121212; /* Dark background for the entire app */
-        color: #e0e0e0; /* Light text color */
-    }
-    
-    /* Sidebar styling */
-    section[data-testid="stSidebar"] {
-        background-color: #1e1e1e; /* Dark background for the sidebar */
-        border-right: 1px solid #333; /* Subtle border */
-    }
-
-    /* Sidebar headers */
-    .stSidebar h2, .stSidebar h4 {
-        color: #ffffff !important; /* White header text */
-    }
-
-    /* Headers */
-    h1, h2, h3, h4 {
-        color: #ffffff !important; /* White headers */
-    }
-    
-    /* Text elements */
-    p, label, .stMarkdown {
-        color: #e0e0e0 !important; /* Light text color */
-        font-size: 1rem !important;
-    }
-</style>
-""", unsafe_allow_html=True)
-
 MAX_COLUMNS = 20
 SUPPORTED_FILE_TYPES = ["csv", "xlsx", "xls"]
+CSS_PATH = Path(__file__).with_name("style.css")
+MAX_SCATTER_POINTS = 5000
 
 # Sidebar header styling
 st.sidebar.markdown("<h2 style='color: #8ab4f8; font-size: 1.5rem; margin-bottom: 1rem;'>Plot Settings</h2>", unsafe_allow_html=True)
@@ -221,6 +509,14 @@ with st.sidebar.expander("Dots Settings", expanded=False):
     if points_on:
         point_opacity = st.slider("Point Opacity", 0.0, 1.0, 0.8, 0.01)
         point_jitter = st.slider("Point Jitter Width", 0.0, 1.0, 0.2, 0.01)
+        max_scatter_points = st.slider(
+            "Max Points per Group",
+            min_value=500,
+            max_value=50000,
+            value=MAX_SCATTER_POINTS,
+            step=500,
+            key="max_scatter_points"
+        )
 
 st.sidebar.markdown("<hr>", unsafe_allow_html=True)
 
@@ -228,9 +524,10 @@ st.sidebar.markdown("<hr>", unsafe_allow_html=True)
 with st.sidebar.expander("Colors", expanded=False):
     st.markdown("<h4 style='color: #8ab4f8; font-size: 1.2rem;'>Theme Selection</h4>", unsafe_allow_html=True)
     color_palette = st.selectbox("Color Palette", list(COLOR_PALETTES.keys()), index=0, key="color_palette")
+    selected_palette = tuple(COLOR_PALETTES[color_palette])
     if color_palette == "Custom":
         custom_colors = st.text_area("Custom Colors (comma-separated HEX codes)", value="#8ab4f8,#4caf50", key="custom_colors")
-        COLOR_PALETTES["Custom"] = [color.strip() for color in custom_colors.split(",")]
+        selected_palette = tuple(color.strip() for color in custom_colors.split(","))
     
     st.markdown("<h4 style='color: #8ab4f8; font-size: 1.2rem;'>Element Colors</h4>", unsafe_allow_html=True)
     violin_color = st.color_picker("Violin Fill Color", "#8ab4f8", key="violin_color")
@@ -251,166 +548,80 @@ with st.sidebar.expander("Y-Axis Scale Settings", expanded=False):
     y_min = st.number_input("Y-Axis Minimum", value=None, step=1.0, format="%.2f", key="y_min")
     y_max = st.number_input("Y-Axis Maximum", value=None, step=1.0, format="%.2f", key="y_max")
 
-# Main content area
-st.markdown("<h1 style='text-align: center; color: #8ab4f8;'>Raincloud Plot Generator</h1>", unsafe_allow_html=True)
-
-st.markdown("<p style='font-size: 1.1rem;'>Upload your data file to generate a raincloud plot.</p>", unsafe_allow_html=True)
+# Main content area: dark mode theme CSS and the static page header go out in a single markdown call
+st.markdown(
+    f"<style>\n{load_css(CSS_PATH)}</style>\n"
+    "<h1 style='text-align: center; color: #8ab4f8;'>Raincloud Plot Generator</h1>\n"
+    "<p style='font-size: 1.1rem;'>Upload your data file to generate a raincloud plot.</p>",
+    unsafe_allow_html=True
+)
 uploaded_file = st.file_uploader("Choose a CSV or Excel file", type=SUPPORTED_FILE_TYPES)
 
 # Load and process data if file is uploaded
 df = load_data(uploaded_file)
 
+# Only numeric columns can be plotted; text columns (IDs, labels) are dropped before melting
 if df is not None:
-    columns = df.columns[:MAX_COLUMNS]
-    df_melted = df.select(columns).melt(variable_name="Group", value_name="Value")
-    df_pd = df_melted.to_pandas()
-    
-    selected_palette = COLOR_PALETTES[color_palette]
-    group_colors = {group: selected_palette[i % len(selected_palette)] for i, group in enumerate(df_pd["Group"].unique())}
+    numeric_columns = tuple(df.select(cs.numeric()).columns)
+    dropped_columns = [column for column in df.columns if column not in numeric_columns]
+    if dropped_columns:
+        st.warning(f"Ignoring non-numeric columns: {', '.join(dropped_columns)}")
+    if not numeric_columns:
+        st.error("No numeric columns found. Please upload a file with at least one numeric column.")
+        df = None
+
+if df is not None:
+    data_key = hashlib.sha1(uploaded_file.getvalue()).hexdigest()
+    columns = numeric_columns  # Already projected to MAX_COLUMNS by _parse_bytes
+    df_melted, groups, group_arrays = prepare_long_data(data_key, columns, df)
+    descriptive_stats = compute_descriptive_stats(data_key, columns, df_melted, group_arrays)
     
     st.markdown("<h2 style='color: #8ab4f8; margin-top: 2rem;'>Raincloud Plot</h2>", unsafe_allow_html=True)
     
-    fig = go.Figure()
-
-    group_positions = [i * group_spacing for i in range(len(df_pd["Group"].unique()))]
-
-    for i, group in enumerate(df_pd["Group"].unique()):
-        y = df_pd[df_pd["Group"] == group]["Value"]
-        x_base = group_positions[i]
-
-        if violin_on:
-            # Determine the direction of the violin
-            side = "negative" if violin_direction == "Left" else "positive"
-            violin_fill_color = selected_palette[i % len(selected_palette)]
-
-            fig.add_trace(go.Violin(
-                y=y,
-                x=[x_base] * len(y),
-                name=group,
-                side=side,
-                width=violin_width,
-                opacity=violin_opacity,
-                line=dict(width=violin_line_width, color=violin_outline_color),
-                fillcolor=violin_fill_color,
-                meanline_visible=False,
-                showlegend=False
-            ))
-
-        if box_on:
-            fig.add_trace(go.Box(
-                y=y,
-                x=[x_base + violin_box_gap] * len(y),
-                name=group,
-                line=dict(color="#000000", width=box_line_width),  # Outline color to black
-                fillcolor=box_color,
-                boxpoints=False,
-                opacity=box_opacity,
-                width=box_width,
-                showlegend=False
-            ))
-
-        if points_on:
-            # Ensure dots face the opposite direction of the violin
-            jitter_direction = 1 if side == "negative" else -1
-            jitter = point_jitter * (np.random.rand(len(y)) - 0.5)
-
-            fig.add_trace(go.Scatter(
-                y=y,
-                x=x_base + violin_box_gap + (box_points_gap * jitter_direction) + jitter,
-                mode="markers",
-                marker=dict(
-                    size=point_size,
-                    opacity=point_opacity,
-                    color=group_colors[group],  # Using group_colors for marker color
-                    line=dict(color=points_outline_color, width=point_outline_width)
-                ),
-                name=group,
-                showlegend=False
-            ))
-
-    configure_plot_layout(fig, fig_title, x_axis_label, y_axis_label, group_positions, list(df_pd["Group"].unique()), plot_width, plot_height, background_color, grid_color, y_min, y_max)
+    group_positions = tuple(i * group_spacing for i in range(len(groups)))
+    trace_params = dict(
+        palette=selected_palette,
+        group_positions=group_positions,
+        violin_on=violin_on,
+        violin_direction=violin_direction if violin_on else None,
+        violin_width=violin_width,
+        violin_box_gap=violin_box_gap,
+        box_on=box_on,
+        box_width=box_width,
+        points_on=points_on,
+        box_points_gap=box_points_gap,
+        point_jitter=point_jitter if points_on else None,
+        max_scatter_points=max_scatter_points if points_on else None
+    )
+    style_params = dict(
+        violin_opacity=violin_opacity if violin_on else None,
+        violin_line_width=violin_line_width,
+        violin_outline_color=violin_outline_color,
+        box_opacity=box_opacity if box_on else None,
+        box_line_width=box_line_width,
+        box_color=box_color,
+        point_size=point_size,
+        point_opacity=point_opacity if points_on else None,
+        point_outline_width=point_outline_width,
+        points_outline_color=points_outline_color
+    )
+    layout_args = (fig_title, x_axis_label, y_axis_label, list(group_positions), list(groups), plot_width, plot_height, background_color, grid_color, y_min, y_max)
+    fig = go.Figure(
+        data=build_traces(data_key, columns, group_arrays, groups, trace_params),
+        layout=build_plot_layout(*layout_args)
+    )
+    apply_trace_styles(fig, style_params)
 
-    st.plotly_chart(fig, use_container_width=False)
+    st.plotly_chart(fig, use_container_width=False, key="main_plot")
 
     # Export Options with Simplified PNG Settings
-    st.markdown("<h2 style='color: #ffffff; margin-top: 2rem;'>Export Options</h2>", unsafe_allow_html=True)
-
-    try:
-        # Requires: pip install kaleido
-        import kaleido  # Ensure kaleido is installed for exporting images
-        col1, col2, col3, col4 = st.columns(4)  # Adjust columns to 4 for export options
-
-        # Allow users to customize PNG export scale and background
-        st.markdown("<h4 style='color: #8ab4f8;'>Customize PNG Export</h4>", unsafe_allow_html=True)
-        export_scale = st.slider("Export Scale", min_value=1, max_value=10, value=2, step=1)
-        st.markdown(
-            "<p style='font-size: 0.9rem; color: #e0e0e0;'>"
-            "The export scale multiplies the resolution of the exported image. For example, "
-            "a scale of 2 doubles the resolution, making the image sharper and suitable for high-quality outputs like presentations or printing."
-            "</p>",
-            unsafe_allow_html=True
-        )
-        transparent_background = st.checkbox("Transparent Background", value=True)
-
-        # Update layout explicitly before exporting
-        fig.update_layout(
-            plot_bgcolor="rgba(0,0,0,0)" if transparent_background else background_color,  # Transparent or custom background
-            paper_bgcolor="rgba(0,0,0,0)" if transparent_background else background_color,  # Transparent or custom background
-            font=dict(color="black")  # Ensure font color matches
-        )
-
-        with col1:
-            st.download_button(
-                "Download PNG",
-                fig.to_image(format="png", scale=export_scale),  # Use scale for resolution
-                "raincloud_plot.png",
-                "image/png"
-            )
-        with col2:
-            st.download_button(
-                "Download SVG",
-                fig.to_image(format="svg"),  # SVG format
-                "raincloud_plot.svg",
-                "image/svg+xml"
-            )
-        with col3:
-            st.download_button(
-                "Download PDF",
-                fig.to_image(format="pdf"),  # PDF format
-                "raincloud_plot.pdf",
-                "application/pdf"
-            )
-        try:
-            with col4:
-                csv_export = df_melted.to_pandas().to_csv(index=False)
-                st.download_button(
-                    "Download Data (CSV)",
-                    csv_export,
-                    "raincloud_data.csv",
-                    "text/csv"
-                )
-        except Exception as e:
-            st.warning(f"Error generating CSV: {e}")
-    except ImportError:
-        st.warning("Please install `kaleido` using `pip install -U kaleido` to enable image downloads.")
-    except Exception as e:
-        st.warning(f"Error generating image: {e}")
+    # Everything the figure is built from; the export section compares it to tell
+    # whether prepared images are stale
+    plot_signature = (data_key, columns, trace_params, style_params, layout_args)
+    render_export_options(fig, df_melted, background_color, plot_signature)
 
     # Add Statistics Summary Section
     st.markdown("<h2 style='color: #ffffff; margin-top: 2rem;'>Statistics Summary</h2>", unsafe_allow_html=True)
 
-    # Calculate descriptive statistics for each group
-    descriptive_stats = df_pd.groupby("Group")["Value"].describe().reset_index()
-    descriptive_stats.rename(columns={
-        "count": "Count",
-        "mean": "Mean",
-        "std": "Std Dev",
-        "min": "Min",
-        "25%": "25th Percentile",
-        "50%": "Median",
-        "75%": "75th Percentile",
-        "max": "Max"
-    }, inplace=True)
-
-    # Display the descriptive statistics as a table
-    st.dataframe(descriptive_stats)
\ No newline at end of file
+    # Display the descriptive statistics for each group
+    st.table(descriptive_stats.with_columns(pl.col(pl.Float64).round(3)))
\ No newline at end of file
@@ -0,0 +1,54 @@
+# Numba kernel for per-group descriptive statistics. Kept in its own module so the
+# compiled dispatcher is imported once per server process instead of being redefined
+# on every Streamlit rerun. Requires: pip install numba
+import numpy as np
+from numba import njit, prange
+
+@njit(cache=True)
+def _quantile_ranks(n, q):
+    # Closest ranks and weight for linear interpolation, matching pandas/Polars "linear"
+    pos = q * (n - 1)
+    lo = int(np.floor(pos))
+    return lo, min(lo + 1, n - 1), pos - lo
+
+# Fused per-group kernel over values stored contiguously by group, parallel across
+# groups; fills out[g] with the app's DESCRIBE_COLUMNS, in order. Count, mean, std, min
+# and max come from one Welford sweep; quantiles from a single partial sort
+@njit(parallel=True, cache=True)
+def group_describe(values, offsets, out):
+    for g in prange(len(offsets) - 1):
+        chunk = values[offsets[g]:offsets[g + 1]]
+        n = len(chunk)
+        out[g, 0] = n
+        if n == 0:
+            out[g, 1:] = np.nan
+            continue
+        mean = 0.0
+        m2 = 0.0
+        lowest = chunk[0]
+        highest = chunk[0]
+        for k in range(n):
+            value = chunk[k]
+            delta = value - mean
+            mean += delta / (k + 1)
+            m2 += delta * (value - mean)
+            lowest = min(lowest, value)
+            highest = max(highest, value)
+        out[g, 1] = mean
+        out[g, 2] = np.sqrt(m2 / (n - 1)) if n > 1 else np.nan
+        out[g, 3] = lowest
+        out[g, 7] = highest
+
+        # Partition once around every rank the three quantiles need
+        ranks = np.empty(6, dtype=np.int64)
+        weights = np.empty(3)
+        for k in range(3):
+            lo, hi, weight = _quantile_ranks(n, 0.25 * (k + 1))
+            ranks[2 * k] = lo
+            ranks[2 * k + 1] = hi
+            weights[k] = weight
+        partitioned = np.partition(chunk, ranks)
+        for k in range(3):
+            lo_value = partitioned[ranks[2 * k]]
+            hi_value = partitioned[ranks[2 * k + 1]]
+            out[g, 4 + k] = lo_value + (hi_value - lo_value) * weights[k]